@@ -1,22 +1,28 @@
 import os
+import re
 import json
 import time
 import asyncio
 import logging
 import pymysql
+import numpy as np
 import pandas as pd
-import aiohttp
+import httpx
 import nest_asyncio
 import streamlit as st
 from rich.progress import Progress
 from dotenv import load_dotenv
+from dbutils.pooled_db import PooledDB
+from urllib.parse import urljoin
 
 # Selenium and WebDriver Manager for Edge
 from selenium import webdriver
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.common.exceptions import WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.core.driver_cache import DriverCacheManager
 
 
 # Allow nested event loops (useful in Streamlit/Jupyter)
@@ -27,14 +33,35 @@ st.set_page_config(page_title="WA Athlete ID Finder", layout="wide")
 
 # Setup basic logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logging.getLogger("httpx").setLevel(logging.WARNING)  # httpx logs every request at INFO
 load_dotenv()
 
+def cache_day():
+    # Disk-persisted Streamlit caches ignore ttl, so functions persisted to disk take
+    # the current day as an argument to refresh their cached result once a day
+    return time.strftime("%Y-%m-%d")
+
 ############################################################
 # PART 1: Get athlete names from MySQL database
 ############################################################
 
-@st.cache_data(show_spinner=True)
-def load_athlete_names():
+@st.cache_resource
+def get_db_pool(host, port, user, password, database):
+    # One pool per set of connection details, shared across reruns and sessions, so
+    # authenticated connections are reused instead of reconnecting on every load
+    return PooledDB(
+        creator=pymysql,
+        mincached=2,
+        maxcached=5,
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database
+    )
+
+@st.cache_data(persist="disk", show_spinner=True)
+def load_athlete_names(day):
     # Get database connection details from environment variables
     DB_HOST = os.environ.get("DB_HOST", "sportsdb-sports-database-for-web-scrapes.g.aivencloud.com")
     DB_PORT = int(os.environ.get("DB_PORT", 16439))
@@ -42,14 +69,11 @@ def load_athlete_names():
     DB_PASSWORD = os.environ.get("DB_PASSWORD")
     DB_NAME = os.environ.get("DB_NAME", "defaultdb")
 
-    conn = pymysql.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
-    cursor = conn.cursor()
+    # Borrow a pooled connection; close() below hands it back to the pool
+    conn = get_db_pool(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME).connection()
+    # Unbuffered server-side cursor: rows stream straight into the names list
+    # instead of being materialized as a tuple of tuples first
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
 
     query = """
     SELECT DISTINCT Competitor_Name, IAAF_ID, Gender 
@@ -57,21 +81,69 @@ def load_athlete_names():
     WHERE Nationality = %s
     """
     cursor.execute(query, ("QAT",))
-    results = cursor.fetchall()
-    df_QAT = pd.DataFrame(results, columns=['Competitor_Name', 'IAAF_ID', 'Gender'])
+    athlete_names = [competitor_name for competitor_name, _, _ in cursor]
     cursor.close()
     conn.close()
 
-    athlete_names = df_QAT['Competitor_Name'].tolist()
     logging.info(f"Loaded {len(athlete_names)} athlete names from the database.")
     return athlete_names
 
 ############################################################
-# PART 2: Use Selenium to get GraphQL endpoint URL and API key
+# PART 2: Get GraphQL endpoint URL and API key (page scripts, Selenium fallback)
 ############################################################
 
-@st.cache_data(show_spinner=True)
-def get_api_details():
+# Page that queries the GraphQL API on load
+calendar_results_url = 'https://worldathletics.org/competition/calendar-results'
+
+def probe_api_details(client, request_url, api_key):
+    # Send a one-name search with the scraped details, so an unrelated /graphql URL or a stale key
+    # is rejected here instead of being cached for a day and failing every load
+    payload = {
+        "operationName": "SearchCompetitorsBatch",
+        "query": build_batch_query(1),
+        "variables": {"countryCode": "QAT", "q0": "a"}
+    }
+    try:
+        response = client.post(request_url, json=payload, headers={"x-api-key": api_key})
+        return response.status_code == 200 and "a0" in (response.json().get("data") or {})
+    except (httpx.HTTPError, ValueError) as e:
+        logging.warning(f"Error probing scraped API details: {e}")
+        return False
+
+def scrape_api_details():
+    # The endpoint and x-api-key ship inside the page's JS bundles, so plain HTTP
+    # requests can usually find them without starting a browser
+    with httpx.Client(timeout=10.0, follow_redirects=True, headers={"User-Agent": "Mozilla/5.0"}) as client:
+        try:
+            html = client.get(calendar_results_url).text
+        except httpx.HTTPError as e:
+            logging.warning(f"Error fetching {calendar_results_url}: {e}")
+            return None, None
+        script_urls = re.findall(r'<script[^>]+src="([^"]+\.js)"', html)
+        logging.info(f"Scanning {len(script_urls)} page scripts for API details...")
+        for script_url in script_urls:
+            # A bundle that fails or times out is skipped instead of ending the whole scan
+            try:
+                js = client.get(urljoin(calendar_results_url, script_url)).text
+            except httpx.HTTPError as e:
+                logging.warning(f"Error fetching page script {script_url}: {e}")
+                continue
+            # Both values must come from the same bundle, where the client that sends them is configured
+            url_match = re.search(r'["\'](https://[^"\']+/graphql)["\']', js)
+            key_match = re.search(r'["\']x-api-key["\']\s*:\s*["\']([\w-]+)["\']', js)
+            if url_match and key_match:
+                request_url, api_key = url_match.group(1), key_match.group(1)
+                if not probe_api_details(client, request_url, api_key):
+                    logging.warning(f"Scraped API details from {script_url} failed a probe query")
+                    return None, None
+                logging.info(f"Extracted request_url: {request_url}")
+                logging.info(f"Extracted x-api-key: {api_key}")
+                return request_url, api_key
+    return None, None
+
+@st.cache_resource
+def get_chrome_driver():
+    # One headless Chrome is started per server process and reused across reruns
 
     # Configure Chrome options for headless mode
     chrome_options = ChromeOptions()
@@ -83,40 +155,78 @@ def get_api_details():
     # Set performance logging via ChromeOptions capabilities
     chrome_options.set_capability("goog:loggingPrefs", {'performance': 'ALL'})
 
-    # Initialize Chrome WebDriver using ChromeDriverManager
-    driver = webdriver.Chrome(
-        service=ChromeService(ChromeDriverManager(driver_version="120.0.6099.224").install()),
+    # Initialize Chrome WebDriver using ChromeDriverManager. The pinned driver stays valid in the
+    # local driver cache for a year, so install() does not go back to the network on every start
+    driver_manager = ChromeDriverManager(
+        driver_version="120.0.6099.224",
+        cache_manager=DriverCacheManager(valid_range=365)
+    )
+    return webdriver.Chrome(
+        service=ChromeService(driver_manager.install()),
         options=chrome_options
     )
 
-    selenium_url = 'https://worldathletics.org/competition/calendar-results'
-    driver.get(selenium_url)
+def capture_api_details_with_selenium():
+    driver = get_chrome_driver()
+    try:
+        # Drain log entries left over from earlier loads, so a stale API key is never picked up
+        driver.get_log('performance')
+        driver.get(calendar_results_url)
+    except WebDriverException as e:
+        # The cached browser died (crash, idle kill); shut it down, start a fresh one and retry once
+        logging.warning(f"Cached Chrome driver failed, restarting it: {e}")
+        try:
+            driver.quit()
+        except Exception as quit_error:
+            logging.warning(f"Error quitting the failed Chrome driver: {quit_error}")
+        get_chrome_driver.clear()
+        driver = get_chrome_driver()
+        driver.get(calendar_results_url)
     logging.info("Loading calendar-results page...")
-    time.sleep(10)  # Adjust as needed for full page load
 
-    logs = driver.get_log('performance')
+    # Poll the performance log until the page's GraphQL request shows up (for at most 10s)
+    # instead of always sleeping for a full page load; get_log drains the buffer on each call
     request_url = None
     api_key = None
-    for log in logs:
-        try:
-            log_json = json.loads(log['message'])['message']
-            if log_json.get('method') == 'Network.requestWillBeSent':
-                request = log_json['params'].get('request', {})
-                if request.get('method') == 'POST' and 'graphql' in request.get('url', ''):
-                    headers_req = request.get('headers', {})
-                    possible_api_key = headers_req.get('x-api-key')
-                    if possible_api_key:
-                        request_url = request['url']
-                        api_key = possible_api_key
-                        logging.info(f"Extracted request_url: {request_url}")
-                        logging.info(f"Extracted x-api-key: {api_key}")
-                        break
-        except Exception as e:
-            logging.warning(f"Error processing log: {e}")
-    driver.quit()
+    deadline = time.time() + 10
+    while not api_key and time.time() < deadline:
+        for log in driver.get_log('performance'):
+            try:
+                log_json = json.loads(log['message'])['message']
+                if log_json.get('method') == 'Network.requestWillBeSent':
+                    request = log_json['params'].get('request', {})
+                    if request.get('method') == 'POST' and 'graphql' in request.get('url', ''):
+                        headers_req = request.get('headers', {})
+                        possible_api_key = headers_req.get('x-api-key')
+                        if possible_api_key:
+                            request_url = request['url']
+                            api_key = possible_api_key
+                            logging.info(f"Extracted request_url: {request_url}")
+                            logging.info(f"Extracted x-api-key: {api_key}")
+                            break
+            except Exception as e:
+                logging.warning(f"Error processing log: {e}")
+        if not api_key:
+            time.sleep(0.25)
+
+    # Park the idle browser on a blank page, so it stops sending requests into the performance log
+    try:
+        driver.get("about:blank")
+    except WebDriverException as e:
+        logging.warning(f"Error leaving the calendar-results page: {e}")
+    return request_url, api_key
+
+@st.cache_data(ttl=86400, show_spinner=True)
+def get_api_details():
+    request_url, api_key = scrape_api_details()
+
+    # Only launch headless Chrome when the page scripts did not give the details away
+    if not request_url or not api_key:
+        logging.info("API details not found in page scripts, falling back to Selenium...")
+        request_url, api_key = capture_api_details_with_selenium()
 
     if not request_url or not api_key:
-        logging.error("Could not extract API key or request URL from Selenium logs.")
+        logging.error("Could not extract API key or request URL from page scripts or Selenium logs.")
         st.error("Error extracting API details from World Athletics. Please try again later.")
         st.stop()
     return request_url, api_key
@@ -125,9 +235,8 @@ def get_api_details():
 # PART 3: Asynchronous GraphQL queries for competitor info
 ############################################################
 
-# GraphQL query for searching competitors
-graphql_query = """query SearchCompetitors($query: String, $gender: GenderType, $disciplineCode: String, $environment: String, $countryCode: String) {
-  searchCompetitors(query: $query, gender: $gender, disciplineCode: $disciplineCode, environment: $environment, countryCode: $countryCode) {
+# Fields requested for every competitor returned by searchCompetitors
+competitor_fields = """
     aaAthleteId
     familyName
     givenName
@@ -137,72 +246,172 @@ graphql_query = """query SearchCompetitors($query: String, $gender: GenderType,
     gender
     country
     urlSlug
-    __typename
-  }
-}"""
+    __typename"""
+
+# Number of athlete names looked up per GraphQL request
+batch_size = 25
+
+def build_batch_query(n_names):
+    # One aliased searchCompetitors field (a0, a1, ...) per athlete name, all sent in a single request
+    variables = ", ".join(f"$q{j}: String" for j in range(n_names))
+    fields = "".join(
+        f"\n  a{j}: searchCompetitors(query: $q{j}, countryCode: $countryCode) {{{competitor_fields}\n  }}"
+        for j in range(n_names)
+    )
+    return f"query SearchCompetitorsBatch($countryCode: String, {variables}) {{{fields}\n}}"
 
-async def fetch_competitor_info(session, athlete_name, request_url, headers, semaphore):
+# Competitor fields kept in the final DataFrame, alongside athlete_name
+competitor_columns = ["aaAthleteId", "urlSlug", "birthDate", "disciplines"]
+
+async def fetch_competitor_batch(client, start, batch_names, request_url, semaphore, columns, found, answered):
+    variables = {f"q{j}": name for j, name in enumerate(batch_names)}
     payload = {
-        "operationName": "SearchCompetitors",
-        "query": graphql_query,
-        "variables": {"countryCode": "QAT", "query": athlete_name}
+        "operationName": "SearchCompetitorsBatch",
+        "query": build_batch_query(len(batch_names)),
+        "variables": {"countryCode": "QAT", **variables}
     }
     async with semaphore:
         try:
-            async with session.post(request_url, json=payload, headers=headers, timeout=10) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    competitors = data.get("data", {}).get("searchCompetitors", [])
+            response = await client.post(request_url, json=payload)
+            if response.status_code == 200:
+                body = response.json()
+                data = body.get("data") or {}
+                errors = body.get("errors") or []
+                if errors:
+                    logging.error(f"GraphQL errors for batch starting at {batch_names[0]}: {errors}")
+                # A failed alias comes back as null with an error whose path starts at that alias
+                failed_aliases = {error["path"][0] for error in errors if error.get("path")}
+                for j, athlete_name in enumerate(batch_names):
+                    # Only names whose alias came back without an error are answered; the rest are retried on the next load
+                    if f"a{j}" not in data or f"a{j}" in failed_aliases:
+                        continue
+                    answered[start + j] = True
+                    competitors = data[f"a{j}"] or []
                     if competitors:
+                        # Write straight into the preallocated column arrays at this athlete's row
+                        index = start + j
                         first_competitor = competitors[0]
-                        return {
-                            "athlete_name": athlete_name,
-                            "aaAthleteId": first_competitor.get("aaAthleteId"),
-                            "familyName": first_competitor.get("familyName"),
-                            "givenName": first_competitor.get("givenName"),
-                            "birthDate": first_competitor.get("birthDate"),
-                            "disciplines": first_competitor.get("disciplines"),
-                            "iaafId": first_competitor.get("iaafId"),
-                            "gender": first_competitor.get("gender"),
-                            "country": first_competitor.get("country"),
-                            "urlSlug": "https://worldathletics.org/athletes/" + first_competitor.get("urlSlug", "")
-                        }
+                        columns["aaAthleteId"][index] = first_competitor.get("aaAthleteId")
+                        columns["urlSlug"][index] = "https://worldathletics.org/athletes/" + first_competitor.get("urlSlug", "")
+                        columns["birthDate"][index] = first_competitor.get("birthDate")
+                        columns["disciplines"][index] = first_competitor.get("disciplines")
+                        found[index] = True
                     else:
                         logging.info(f"No competitor found for {athlete_name}")
-                        return None
-                else:
-                    logging.error(f"Error fetching {athlete_name}: HTTP {response.status}")
-                    return None
+            else:
+                logging.error(f"Error fetching batch starting at {batch_names[0]}: HTTP {response.status_code}")
         except Exception as e:
-            logging.error(f"Exception fetching {athlete_name}: {e}")
-            return None
+            logging.error(f"Exception fetching batch starting at {batch_names[0]}: {e}")
+    return len(batch_names)
 
 async def fetch_all_competitors(athlete_names, request_url, headers):
-    results = []
+    # Preallocate one array per column, indexed by the athlete's position in athlete_names
+    columns = {column: np.empty(len(athlete_names), dtype=object) for column in competitor_columns}
+    found = np.zeros(len(athlete_names), dtype=bool)
+    answered = np.zeros(len(athlete_names), dtype=bool)  # False where the request itself failed
     semaphore = asyncio.Semaphore(10)  # Adjust concurrency as needed
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch_competitor_info(session, name, request_url, headers, semaphore) for name in athlete_names]
+    # One HTTP/2 client multiplexes every request over a single pooled keep-alive connection
+    limits = httpx.Limits(max_keepalive_connections=20)
+    async with httpx.AsyncClient(http2=True, headers=headers, timeout=10.0, limits=limits) as client:
+        tasks = [asyncio.ensure_future(fetch_competitor_batch(client, start, athlete_names[start:start + batch_size],
+                                                              request_url, semaphore, columns, found, answered))
+                 for start in range(0, len(athlete_names), batch_size)]
         with Progress() as progress:
-            task_progress = progress.add_task("[cyan]Fetching competitor info...", total=len(tasks))
-            for future in asyncio.as_completed(tasks):
-                result = await future
-                if result:
-                    results.append(result)
-                progress.advance(task_progress)
-    return results
-
-@st.cache_data(show_spinner=True)
-def load_competitor_data(athlete_names, request_url, api_key):
+            task_progress = progress.add_task("[cyan]Fetching competitor info...", total=len(athlete_names))
+            gathered = asyncio.gather(*tasks)
+            # Refresh the progress bar on a timer instead of once per completed batch
+            while not gathered.done():
+                progress.update(task_progress, completed=sum(task.result() for task in tasks if task.done()))
+                await asyncio.wait([gathered], timeout=0.1)
+            await gathered
+            progress.update(task_progress, completed=len(athlete_names))
+    return pd.DataFrame({"athlete_name": list(athlete_names), **columns, "found": found, "answered": answered})
+
+# Per-name lookup results (competitor fields, or null when no competitor was found) kept
+# across runs, so names already resolved, including fruitless ones, are not queried again
+queried_names_path = "queried_names.json"
+queried_names_max_age = 7 * 86400  # seconds
+
+def load_queried_names():
+    try:
+        with open(queried_names_path) as f:
+            queried = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    cutoff = time.time() - queried_names_max_age
+    return {name: entry for name, entry in queried.items() if entry["queried_at"] >= cutoff}
+
+def save_queried_names(queried):
+    with open(queried_names_path, "w") as f:
+        json.dump(queried, f)
+
+# Names left unanswered (failed batch or per-alias error) are queried again at most this often
+unanswered_retry_interval = 600  # seconds
+
+class IncompleteCompetitorData(Exception):
+    # Raised out of load_competitor_data when some names went unanswered: st.cache_data does not
+    # cache a call that raises, so a partial result never reaches the persisted cache
+    def __init__(self, df, unanswered_names):
+        super().__init__(f"{len(unanswered_names)} athlete names could not be looked up")
+        self.df = df
+        self.unanswered_names = unanswered_names
+
+@st.cache_data(persist="disk", show_spinner=True)
+def load_competitor_data(athlete_names, _request_url, _api_key, day):
+    # The endpoint and API key are left out of the cache key (leading underscore):
+    # the competitor data does not depend on them
     headers = {
         "Content-Type": "application/json",
-        "x-api-key": api_key
+        "x-api-key": _api_key
     }
-    competitor_results = asyncio.run(fetch_all_competitors(athlete_names, request_url, headers))
-    df = pd.DataFrame(competitor_results,
-                      columns=["athlete_name", "aaAthleteId", "urlSlug",
-                               "birthDate", "disciplines"])
+
+    # Trim and de-duplicate names, then only query the ones not looked up recently
+    athlete_names = list(dict.fromkeys(name.strip() for name in athlete_names if name))
+    queried = load_queried_names()
+    new_names = [name for name in athlete_names if name not in queried]
+    logging.info(f"Querying {len(new_names)} of {len(athlete_names)} athlete names (others cached in {queried_names_path}).")
+    if new_names:
+        df_new = asyncio.run(fetch_all_competitors(new_names, _request_url, headers))
+        queried_at = time.time()
+        # Failed requests are not recorded, so those names are retried on the next load
+        for row in df_new[df_new["answered"]].itertuples(index=False):
+            competitor = {column: getattr(row, column) for column in competitor_columns} if row.found else None
+            queried[row.athlete_name] = {"queried_at": queried_at, "competitor": competitor}
+        save_queried_names(queried)
+
+    # Build the frame column by column rather than from a list of per-name dicts
+    found_names = [name for name in athlete_names if name in queried and queried[name]["competitor"]]
+    df = pd.DataFrame({
+        "athlete_name": found_names,
+        **{column: [queried[name]["competitor"][column] for name in found_names] for column in competitor_columns}
+    })
+
+    # Stopping here keeps an empty (failed) fetch out of the persisted cache
+    if df.empty:
+        logging.error("No competitor data returned from World Athletics.")
+        st.error("Error loading competitor data from World Athletics. Please try again later.")
+        st.stop()
+
+    # Lowercased copies of the searchable columns, so sidebar filters skip case folding per keystroke
+    df["athlete_name_lc"] = df["athlete_name"].str.lower()
+    df["disciplines_lc"] = df["disciplines"].str.lower()
+
+    # Keep a partial result out of the persisted cache, so the unanswered names are queried again later
+    unanswered_names = [name for name in athlete_names if name not in queried]
+    if unanswered_names:
+        raise IncompleteCompetitorData(df, unanswered_names)
     return df
 
+@st.cache_data(ttl=unanswered_retry_interval, show_spinner=False)
+def load_competitor_data_with_retry(athlete_names, _request_url, _api_key, day):
+    # In-memory layer in front of the disk cache: a partial result is kept for unanswered_retry_interval,
+    # so reruns (every sidebar keystroke) reuse it and the unanswered names are retried at most that often
+    try:
+        return load_competitor_data(athlete_names, _request_url, _api_key, day), []
+    except IncompleteCompetitorData as e:
+        logging.warning(f"{e}: {', '.join(e.unanswered_names)}")
+        return e.df, e.unanswered_names
+
 ############################################################
 # PART 4: Streamlit App Layout
 ############################################################
@@ -213,13 +422,18 @@ def main_app():
     st.info("Loading competitor data. This may take 30 seconds to 1 minute on the first load...")
 
     # Get athlete names from DB
-    athlete_names = load_athlete_names()
+    athlete_names = load_athlete_names(cache_day())
 
-    # Get API details using Selenium
+    # Get API details from the page scripts (Selenium fallback)
     request_url, api_key = get_api_details()
 
-    # Load competitor data (cached)
-    df_competitors = load_competitor_data(athlete_names, request_url, api_key)
+    # Load competitor data (cached on disk, keyed on the set of athlete names and the day).
+    # NULL names are dropped and the rest trimmed before sorting, so the key is stable and sortable
+    athlete_names = tuple(sorted({name.strip() for name in athlete_names if name}))
+    df_competitors, unanswered_names = load_competitor_data_with_retry(athlete_names, request_url, api_key, cache_day())
+    if unanswered_names:
+        st.warning(f"{len(unanswered_names)} athlete names could not be looked up. "
+                   f"They are retried after {unanswered_retry_interval // 60} minutes.")
 
     st.success("Data loaded successfully!")
 
@@ -228,15 +442,15 @@ def main_app():
     search_name = st.sidebar.text_input("Search Athlete Name")
     search_event = st.sidebar.text_input("Search Event (Discipline)")
 
-    # Filter DataFrame based on sidebar input
-    filtered_df = df_competitors.copy()
+    # Filter DataFrame based on sidebar input (plain substring search on the lowercased columns)
+    filtered_df = df_competitors
     if search_name:
-        filtered_df = filtered_df[filtered_df["athlete_name"].str.contains(search_name, case=False, na=False)]
+        filtered_df = filtered_df[filtered_df["athlete_name_lc"].str.contains(search_name.lower(), regex=False, na=False)]
     if search_event:
-        filtered_df = filtered_df[filtered_df["disciplines"].str.contains(search_event, case=False, na=False)]
+        filtered_df = filtered_df[filtered_df["disciplines_lc"].str.contains(search_event.lower(), regex=False, na=False)]
 
     st.write("### Competitor Data")
-    st.dataframe(filtered_df, use_container_width=True)
+    st.dataframe(filtered_df.drop(columns=["athlete_name_lc", "disciplines_lc"]), use_container_width=True)
 
 if __name__ == "__main__":
     main_app()
@@ -1,15 +1,24 @@
 # Full code to load Excel sheet, perform fuzzy matching, and add new columns to the Athlete sheet
+import importlib.util
 import pandas as pd
 import numpy as np
-from fuzzywuzzy import fuzz, process
+from rapidfuzz import fuzz, process, utils
 import datetime
 from tqdm import tqdm
 
 print("Loading Excel file...")
 # Load both sheets
 file_path = "2025-Athletics-Competition-Database.xlsx"
-athlete_df = pd.read_excel(file_path, sheet_name="Athlete")
-wa_codes_df = pd.read_excel(file_path, sheet_name="WorldAthletics_codes")
+# Open the workbook once and parse both sheets from it, using the much faster Rust-based calamine
+# reader when python-calamine is installed and pandas supports it (2.2+), openpyxl otherwise
+pandas_version = tuple(int(part) for part in pd.__version__.split(".")[:2])
+use_calamine = pandas_version >= (2, 2) and importlib.util.find_spec("python_calamine") is not None
+excel_engine = "calamine" if use_calamine else "openpyxl"
+with pd.ExcelFile(file_path, engine=excel_engine) as xls:
+    # Names are read with pandas' string dtype so the name concatenations below run vectorized
+    # (Arrow-backed when pyarrow is installed)
+    athlete_df = xls.parse("Athlete", dtype={'First_name': 'string', 'Last_name': 'string'})
+    wa_codes_df = xls.parse("WorldAthletics_codes")
 
 # Make a copy of the original dataframe to preserve it
 original_athlete_df = athlete_df.copy()
@@ -18,102 +27,100 @@ original_athlete_df = athlete_df.copy()
 athletes_without_wa = athlete_df[athlete_df['WA_no'].isna()].copy()
 print(f"Number of athletes without WA_no: {len(athletes_without_wa)} out of {len(athlete_df)}")
 
+def format_birth_dates(dates):
+    # Format datetimes as YYYY-MM-DD in a single NumPy call instead of a per-element strftime (missing dates become NaN)
+    day_strs = np.datetime_as_string(dates.to_numpy(dtype='datetime64[D]'), unit='D')
+    return pd.Series(day_strs, index=dates.index, dtype=object).where(dates.notna())
+
 # Prepare athlete names for matching
 print("Preparing athlete data for matching...")
 athletes_without_wa['Full_Name'] = athletes_without_wa['First_name'] + ' ' + athletes_without_wa['Last_name']
-athletes_without_wa['Full_Name_Reversed'] = athletes_without_wa['Last_name'] + ' ' + athletes_without_wa['First_name']
 
 # Convert birth dates to string format for easier comparison
-athletes_without_wa['Birth_date_str'] = athletes_without_wa['Birth_date'].dt.strftime('%Y-%m-%d')
+athletes_without_wa['Birth_date_str'] = format_birth_dates(pd.to_datetime(athletes_without_wa['Birth_date'], errors='coerce'))
 
 # Prepare WorldAthletics data
 print("Preparing World Athletics data...")
-wa_athletes_dict = {}
-wa_names_list = []
-
-for _, row in wa_codes_df.iterrows():
-    name = row['Name']
-    wa_id = row['ID']
-    birth_date = row['birthDate']
-    birth_date_str = pd.Timestamp(birth_date).strftime('%Y-%m-%d') if pd.notna(birth_date) else None
-    
-    wa_athletes_dict[name] = {
-        'ID': wa_id,
-        'birthDate': birth_date_str,
-        'urlSlug': row['urlSlug'],
-        'disciplines': row['disciplines']
-    }
-    wa_names_list.append(name)
-
-# Function to find the best match for an athlete
-def find_best_match(athlete_name, athlete_birth_date, wa_names, wa_dict):
-    # First, find the best matches based on name
-    matches = process.extract(athlete_name, wa_names, limit=5, scorer=fuzz.token_sort_ratio)
-    
-    best_match = None
-    best_score = 0
-    best_combined_score = 0
-    
-    for match_name, name_score in matches:
-        wa_data = wa_dict[match_name]
-        wa_birth_date = wa_data['birthDate']
-        
-        # Calculate birth date score if both dates are available
-        birth_date_score = 0
-        if athlete_birth_date and wa_birth_date:
-            # Exact match gets 100, otherwise 0
-            birth_date_score = 100 if athlete_birth_date == wa_birth_date else 0
-        
-        # Calculate combined score (70% name, 30% birth date)
-        # If birth date is missing in either record, rely more on name matching
-        if athlete_birth_date and wa_birth_date:
-            combined_score = 0.7 * name_score + 0.3 * birth_date_score
-        else:
-            combined_score = name_score
-        
-        if combined_score > best_combined_score:
-            best_combined_score = combined_score
-            best_score = name_score
-            best_match = {
-                'Matched_Name': match_name,
-                'Matched_ID': wa_data['ID'],
-                'Matched_Birth_Date': wa_data['birthDate'],
-                'Name_Match_Score': name_score,
-                'Birth_Date_Match_Score': birth_date_score,
-                'Combined_Match_Score': combined_score
-            }
-    
-    return best_match
-
-# Apply fuzzy matching to each athlete without WA_no
+# Format all birth dates in one vectorized pass (missing dates become None)
+wa_birth_dates = pd.to_datetime(wa_codes_df['birthDate'], errors='coerce')
+wa_birth_date_strs = format_birth_dates(wa_birth_dates).where(wa_birth_dates.notna(), None)
+
+# Keep the WA data as parallel columns, so a match's position indexes its name, ID and birth date directly
+wa_names_list = wa_codes_df['Name'].tolist()
+wa_ids = wa_codes_df['ID'].to_numpy()
+wa_birth_arr = wa_birth_date_strs.to_numpy()
+
+# Token-sort every name once up front, so each comparison is a plain ratio on canonical strings
+def token_sort(name):
+    return " ".join(sorted(utils.default_process(name).split()))
+
+wa_sorted_list = [token_sort(name) for name in wa_names_list]
+
+# Index WA records by (token-sorted name, birth date) for O(1) exact match lookups
+exact_idx = {}
+for wa_idx, (wa_sorted, birth_date_str) in enumerate(zip(wa_sorted_list, wa_birth_arr)):
+    if birth_date_str:
+        exact_idx.setdefault((wa_sorted, birth_date_str), wa_idx)
+
+# Athletes with an exact name and birth date hit skip fuzzy matching entirely
+n_athletes = len(athletes_without_wa)
+queries = [token_sort(name) for name in athletes_without_wa['Full_Name']]
+exact_hits = [exact_idx.get(key) for key in zip(queries, athletes_without_wa['Birth_date_str'])]
+fuzzy_rows = [i for i, hit in enumerate(exact_hits) if hit is None]
+print(f"Exact name and birth date matches: {n_athletes - len(fuzzy_rows)} out of {n_athletes}")
+
+# Score the remaining athlete names against every WA name in a single C++ pass.
+# Sorted tokens make the normal and reversed name orders identical, so one row per athlete is enough,
+# and athletes sharing a name reuse the same row of scores. Scores are rounded half to even into
+# integers, exactly as fuzzywuzzy's were, so ties between candidates resolve the same way.
 print("Performing fuzzy matching...")
+unique_queries, query_row = np.unique(np.array([queries[i] for i in fuzzy_rows], dtype=str), return_inverse=True)
+name_scores = np.round(process.cdist(unique_queries.tolist(), wa_sorted_list,
+                                     scorer=fuzz.ratio, workers=-1, dtype=np.float64)).astype(np.uint8)[query_row]
+score_row = dict(zip(fuzzy_rows, range(len(fuzzy_rows))))
+
+# Take the 5 best name candidates of every athlete at once, highest score first
+# (ties keep list order, like process.extract)
+top_n = min(5, len(wa_names_list))
+top_idx = np.argsort(-name_scores.astype(np.int16), axis=1, kind='stable')[:, :top_n]
+top_name_scores = np.take_along_axis(name_scores, top_idx, axis=1).astype(np.uint16)
+
+# Birth date score is 100 on an exact match, 0 otherwise, and counts (70% name, 30% birth date)
+# whenever the WA athlete has a birth date; an athlete without one then scores 0 for it, as before.
+# Scores stay integers on a 0-1000 scale (7 * name + 3 * birth date) and are divided by 10 only when reported.
+athlete_birth_dates = athletes_without_wa['Birth_date_str'].to_numpy(dtype=object, na_value=None)[fuzzy_rows][:, None]
+top_birth_dates = wa_birth_arr[top_idx]
+has_birth_dates = pd.notna(top_birth_dates)
+birth_date_score = np.where(has_birth_dates & (top_birth_dates == athlete_birth_dates), 100, 0).astype(np.uint16)
+combined_score = np.where(has_birth_dates, 7 * top_name_scores + 3 * birth_date_score, 10 * top_name_scores)
+
+best_col = np.argmax(combined_score, axis=1)
+best_wa_idx = np.take_along_axis(top_idx, best_col[:, None], axis=1).ravel()
+best_combined_score = np.take_along_axis(combined_score, best_col[:, None], axis=1).ravel() / 10
+
+# Collect the best match for each athlete without WA_no, reading plain arrays instead of row Series
+athlete_idxs = athletes_without_wa.index.to_numpy()
+full_names = athletes_without_wa['Full_Name'].to_numpy(dtype=object, na_value=None)
+birth_date_strs = athletes_without_wa['Birth_date_str'].to_numpy(dtype=object, na_value=None)
 results = []
 
-for _, athlete in tqdm(athletes_without_wa.iterrows(), total=len(athletes_without_wa)):
-    # Try matching with both name formats
-    match1 = find_best_match(athlete['Full_Name'], athlete['Birth_date_str'], wa_names_list, wa_athletes_dict)
-    match2 = find_best_match(athlete['Full_Name_Reversed'], athlete['Birth_date_str'], wa_names_list, wa_athletes_dict)
-    
-    # Choose the better match
-    if match1 and match2:
-        best_match = match1 if match1['Combined_Match_Score'] >= match2['Combined_Match_Score'] else match2
-    elif match1:
-        best_match = match1
-    elif match2:
-        best_match = match2
+for i in tqdm(range(n_athletes)):
+    if exact_hits[i] is not None:
+        wa_idx, match_score = exact_hits[i], 100
     else:
-        best_match = None
-    
-    if best_match:
-        results.append({
-            'Athlete_Index': athlete.name,
-            'Athlete_Name': athlete['Full_Name'],
-            'Athlete_Birth_Date': athlete['Birth_date_str'],
-            'Matched_Name': best_match['Matched_Name'],
-            'Matched_ID': best_match['Matched_ID'],
-            'Matched_Birth_Date': best_match['Matched_Birth_Date'],
-            'Match_Score': best_match['Combined_Match_Score']
-        })
+        wa_idx, match_score = best_wa_idx[score_row[i]], best_combined_score[score_row[i]]
+        if match_score <= 0:
+            continue
+
+    results.append({
+        'Athlete_Index': athlete_idxs[i],
+        'Athlete_Name': full_names[i],
+        'Athlete_Birth_Date': birth_date_strs[i],
+        'Matched_Name': wa_names_list[wa_idx],
+        'Matched_ID': wa_ids[wa_idx],
+        'Matched_Birth_Date': wa_birth_arr[wa_idx],
+        'Match_Score': match_score
+    })
 
 # Create a dataframe with the results
 results_df = pd.DataFrame(results)
@@ -127,36 +134,32 @@ athlete_df['WA_Matched_ID'] = None
 athlete_df['WA_Match_Score'] = None
 athlete_df['WA_Match_Confidence'] = None
 athlete_df['WA_Recommended'] = False
-
-# Update the dataframe with the matched data
-for _, match in results_df.iterrows():
-    idx = match['Athlete_Index']
-    athlete_df.loc[idx, 'WA_Matched_Name'] = match['Matched_Name']
-    athlete_df.loc[idx, 'WA_Matched_Birth_Date'] = match['Matched_Birth_Date']
-    athlete_df.loc[idx, 'WA_Matched_ID'] = match['Matched_ID']
-    athlete_df.loc[idx, 'WA_Match_Score'] = match['Match_Score']
-    
-    # Add confidence level
-    if match['Match_Score'] >= 90:
-        athlete_df.loc[idx, 'WA_Match_Confidence'] = 'High'
-        athlete_df.loc[idx, 'WA_Recommended'] = True
-    elif match['Match_Score'] >= 70:
-        athlete_df.loc[idx, 'WA_Match_Confidence'] = 'Medium'
-        athlete_df.loc[idx, 'WA_Recommended'] = True
-    else:
-        athlete_df.loc[idx, 'WA_Match_Confidence'] = 'Low'
-        athlete_df.loc[idx, 'WA_Recommended'] = False
-
-# For high confidence matches, also create a column with the recommended WA_no
 athlete_df['WA_Recommended_ID'] = None
-athlete_df.loc[athlete_df['WA_Match_Score'] >= 90, 'WA_Recommended_ID'] = athlete_df.loc[athlete_df['WA_Match_Score'] >= 90, 'WA_Matched_ID']
+
+# Derive confidence, recommendation and, for high confidence matches, the recommended WA_no
+# (skipped when nothing was matched: an empty results_df has no columns to index)
+if not results_df.empty:
+    results_df.set_index('Athlete_Index', inplace=True)
+    match_score = results_df['Match_Score']
+    results_df['WA_Match_Confidence'] = np.select([match_score >= 90, match_score >= 70], ['High', 'Medium'], 'Low')
+    results_df['WA_Recommended'] = match_score >= 70
+    results_df['WA_Recommended_ID'] = results_df['Matched_ID'].astype(object).where(match_score >= 90, None)
+
+    # Update the dataframe with the matched data in one bulk assignment
+    athlete_df.loc[results_df.index, [
+        'WA_Matched_Name', 'WA_Matched_Birth_Date', 'WA_Matched_ID', 'WA_Match_Score',
+        'WA_Match_Confidence', 'WA_Recommended', 'WA_Recommended_ID'
+    ]] = results_df[[
+        'Matched_Name', 'Matched_Birth_Date', 'Matched_ID', 'Match_Score',
+        'WA_Match_Confidence', 'WA_Recommended', 'WA_Recommended_ID'
+    ]].values
 
 # Save the updated dataframe to a new Excel file
 print("Saving updated athlete data...")
 output_file = "2025-Athletics-Competition-Database-Updated.xlsx"
 
 # Create a writer to save to Excel with multiple sheets
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
     # Save the updated Athlete sheet
     athlete_df.to_excel(writer, sheet_name='Athlete', index=False)
     
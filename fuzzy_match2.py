@@ -1,13 +1,20 @@
+import importlib.util
 import pandas as pd
 import numpy as np
-from fuzzywuzzy import fuzz, process
+from rapidfuzz import fuzz, process, utils
 from tqdm import tqdm
 
 print("Loading Excel file...")
 # Load both sheets
 file_path = "2025-Athletics-Competition-Database.xlsx"
-athlete_df = pd.read_excel(file_path, sheet_name="Athlete")
-wa_codes_df = pd.read_excel(file_path, sheet_name="WorldAthletics_codes")
+# Open the workbook once and parse both sheets from it, using the much faster Rust-based calamine
+# reader when python-calamine is installed and pandas supports it (2.2+), openpyxl otherwise
+pandas_version = tuple(int(part) for part in pd.__version__.split(".")[:2])
+use_calamine = pandas_version >= (2, 2) and importlib.util.find_spec("python_calamine") is not None
+excel_engine = "calamine" if use_calamine else "openpyxl"
+with pd.ExcelFile(file_path, engine=excel_engine) as xls:
+    athlete_df = xls.parse("Athlete")
+    wa_codes_df = xls.parse("WorldAthletics_codes")
 
 # Make a copy of the original dataframe to preserve it
 original_athlete_df = athlete_df.copy()
@@ -16,111 +23,132 @@ original_athlete_df = athlete_df.copy()
 athletes_without_wa = athlete_df[athlete_df['WA_no'].isna()].copy()
 print(f"Number of athletes without WA_no: {len(athletes_without_wa)} out of {len(athlete_df)}")
 
+def format_birth_dates(dates):
+    # Format datetimes as YYYY-MM-DD in a single NumPy call instead of a per-element strftime (missing dates become NaN)
+    day_strs = np.datetime_as_string(dates.to_numpy(dtype='datetime64[D]'), unit='D')
+    return pd.Series(day_strs, index=dates.index, dtype=object).where(dates.notna())
+
 # Prepare athlete data for matching
 print("Preparing athlete data for matching...")
 athletes_without_wa['Full_Name'] = athletes_without_wa['First_name'] + ' ' + athletes_without_wa['Last_name']
-athletes_without_wa['Full_Name_Reversed'] = athletes_without_wa['Last_name'] + ' ' + athletes_without_wa['First_name']
-athletes_without_wa['Birth_date_str'] = pd.to_datetime(athletes_without_wa['Birth_date'], errors='coerce').dt.strftime('%Y-%m-%d')
+athletes_without_wa['Birth_date_str'] = format_birth_dates(pd.to_datetime(athletes_without_wa['Birth_date'], errors='coerce'))
 
 # Prepare World Athletics data
 print("Preparing World Athletics data...")
-wa_athletes_dict = {}
-wa_names_list = []
-for _, row in wa_codes_df.iterrows():
-    name = row['Name']
-    wa_id = row['ID']
-    birth_date = row['birthDate']
-    birth_date_str = pd.Timestamp(birth_date).strftime('%Y-%m-%d') if pd.notna(birth_date) else None
-    wa_athletes_dict[name] = {
-        'ID': wa_id,
-        'birthDate': birth_date_str,
-        'urlSlug': row['urlSlug'],
-        'disciplines': row['disciplines']
-    }
-    wa_names_list.append(name)
+# Format all birth dates in one vectorized pass (missing dates become None)
+wa_birth_dates = pd.to_datetime(wa_codes_df['birthDate'], errors='coerce')
+wa_birth_date_strs = format_birth_dates(wa_birth_dates).where(wa_birth_dates.notna(), None)
+
+# Keep the WA data as parallel columns, so a match's position indexes its name, ID and birth date directly
+wa_names_list = wa_codes_df['Name'].tolist()
+wa_ids = wa_codes_df['ID'].to_numpy()
+wa_birth_arr = wa_birth_date_strs.to_numpy()
+
+# Token-sort every name once up front, so each comparison is a plain ratio on canonical strings.
+# default_process keeps the case-insensitive comparison fuzzywuzzy applied implicitly, and sorted
+# tokens make the normal and reversed name orders identical, so one name per athlete is enough.
+def token_sort(name):
+    return " ".join(sorted(utils.default_process(name).split()))
+
+athletes_without_wa['Full_Name_Sorted'] = [token_sort(name) for name in athletes_without_wa['Full_Name']]
+wa_sorted_list = [token_sort(name) for name in wa_names_list]
 
 # --- Approach 1: Name-first matching ---
-def find_best_match_name_first(athlete_name, athlete_birth_date, wa_names, wa_dict):
-    # Get best matches based on the athlete's name
-    matches = process.extract(athlete_name, wa_names, limit=5, scorer=fuzz.token_sort_ratio)
-    best_match = None
-    best_combined_score = 0
-    for match_name, name_score in matches:
-        wa_data = wa_dict[match_name]
-        wa_birth_date = wa_data['birthDate']
-        # Compare birth dates if both exist
-        birth_date_score = 0
-        if athlete_birth_date and wa_birth_date:
-            birth_date_score = 100 if athlete_birth_date == wa_birth_date else 0
-        # Weighting: 70% name, 30% birth date (if available)
-        if athlete_birth_date and wa_birth_date:
-            combined_score = 0.7 * name_score + 0.3 * birth_date_score
-        else:
-            combined_score = name_score
-        if combined_score > best_combined_score:
-            best_combined_score = combined_score
-            best_match = {
-                'Matched_Name': match_name,
-                'Matched_ID': wa_data['ID'],
-                'Matched_Birth_Date': wa_data['birthDate'],
-                'Name_Match_Score': name_score,
-                'Birth_Date_Match_Score': birth_date_score,
-                'Combined_Match_Score': combined_score
-            }
-    return best_match
+# Score every athlete name against every WA name in one multithreaded C++ call
+print("Scoring athlete names against World Athletics names...")
+n_athletes = len(athletes_without_wa)
+# Identical names are only scored once and share their row of scores. Scores are rounded half to
+# even into integers, exactly as fuzzywuzzy's were, so ties between candidates resolve the same way
+unique_queries, query_rows = np.unique(athletes_without_wa['Full_Name_Sorted'].to_numpy(dtype=str), return_inverse=True)
+name_scores = np.round(process.cdist(unique_queries.tolist(), wa_sorted_list, scorer=fuzz.ratio,
+                                     dtype=np.float64, workers=-1)).astype(np.uint8)[query_rows]
+
+# The 5 best WA candidates of every athlete, highest score first (ties keep list order, like process.extract)
+top_n = min(5, len(wa_names_list))
+top_idxs = np.argsort(-name_scores.astype(np.int16), axis=1, kind='stable')[:, :top_n]
+top_scores = np.take_along_axis(name_scores, top_idxs, axis=1)
+
+# Compare birth dates for all candidates at once: 100 on an exact match, 0 otherwise, counted
+# (70% name, 30% birth date) whenever the WA athlete has a birth date, even if the athlete has none
+athlete_birth_dates = athletes_without_wa['Birth_date_str'].to_numpy(dtype=object, na_value=None)[:, None]
+top_birth_dates = wa_birth_arr[top_idxs]
+has_birth_dates = pd.notna(top_birth_dates)
+birth_date_scores = np.where(has_birth_dates & (top_birth_dates == athlete_birth_dates), 100, 0)
+combined_scores = np.where(has_birth_dates, 0.7 * top_scores + 0.3 * birth_date_scores, top_scores)
+
+# Each athlete's best candidate is one row-wise argmax (the first one on ties)
+best_cols = np.argmax(combined_scores, axis=1)[:, None]
+best_wa_idxs = np.take_along_axis(top_idxs, best_cols, axis=1).ravel()
+best_name_scores = np.take_along_axis(top_scores, best_cols, axis=1).ravel()
+best_birth_date_scores = np.take_along_axis(birth_date_scores, best_cols, axis=1).ravel()
+best_combined_scores = np.take_along_axis(combined_scores, best_cols, axis=1).ravel()
+name_first_matches = {
+    i: {
+        'Matched_Name': wa_names_list[best_wa_idxs[i]],
+        'Matched_ID': wa_ids[best_wa_idxs[i]],
+        'Matched_Birth_Date': wa_birth_arr[best_wa_idxs[i]],
+        'Name_Match_Score': best_name_scores[i],
+        'Birth_Date_Match_Score': best_birth_date_scores[i],
+        'Combined_Match_Score': best_combined_scores[i]
+    }
+    for i in np.flatnonzero(best_combined_scores > 0).tolist()
+}
 
 # --- Approach 2: Birth date-first matching ---
-def find_best_match_birth_first(athlete_birth_date, athlete_name, wa_dict):
-    # If a birth date is provided, filter to candidates with matching birth dates
-    if athlete_birth_date:
-        candidates = {name: data for name, data in wa_dict.items() if data['birthDate'] == athlete_birth_date}
-    else:
-        candidates = wa_dict
-
-    if not candidates:
-        return None
-
-    candidate_names = list(candidates.keys())
-    matches = process.extract(athlete_name, candidate_names, limit=5, scorer=fuzz.token_sort_ratio)
-    best_match = None
-    best_score = 0
-    # Here we weight birth date more heavily: 70% for birth date (which is 100 if it matches)
-    # and 30% for name score.
-    for match_name, name_score in matches:
-        # Since candidate is pre-filtered, birth_date_score is 100
-        combined_score = 0.7 * 100 + 0.3 * name_score
-        if combined_score > best_score:
-            best_score = combined_score
-            best_match = {
-                'Matched_Name': match_name,
-                'Matched_ID': candidates[match_name]['ID'],
-                'Matched_Birth_Date': candidates[match_name]['birthDate'],
-                'Name_Match_Score': name_score,
-                'Birth_Date_Match_Score': 100,
-                'Combined_Match_Score': combined_score
-            }
-    return best_match
+# Join every athlete to the WA athletes sharing their exact birth date in a single merge, then score
+# each pair once. Athletes without a birth date, or with no WA athlete born that day, get no match.
+print("Matching athletes to World Athletics athletes by birth date...")
+wa_candidates_df = pd.DataFrame({
+    'WA_Name': wa_names_list,
+    'WA_Birth_Date': wa_birth_arr,
+    'WA_ID': wa_ids,
+    'WA_Sorted': wa_sorted_list
+})
+birth_pairs = pd.DataFrame({
+    'Athlete_Pos': np.arange(n_athletes),
+    'Birth_date_str': athletes_without_wa['Birth_date_str'].to_numpy(),
+    'Full_Name_Sorted': athletes_without_wa['Full_Name_Sorted'].to_numpy()
+}).dropna(subset=['Birth_date_str']).merge(
+    wa_candidates_df.dropna(subset=['WA_Birth_Date']),
+    left_on='Birth_date_str', right_on='WA_Birth_Date'
+)
+birth_pairs['Name_Match_Score'] = np.round(process.cpdist(birth_pairs['Full_Name_Sorted'].tolist(), birth_pairs['WA_Sorted'].tolist(),
+                                                          scorer=fuzz.ratio, dtype=np.float64, workers=-1)).astype(np.uint8)
+
+# Only the best scoring candidate of each athlete is used, so take it directly like process.extractOne
+# (the merge keeps each athlete's candidates in WA order, so ties go to the first one).
+# The birth date counts 70% (it always matches here) and the name score 30%.
+birth_pairs = birth_pairs.loc[birth_pairs.groupby('Athlete_Pos')['Name_Match_Score'].idxmax()]
+birth_first_matches = {
+    pair.Athlete_Pos: {
+        'Matched_Name': pair.WA_Name,
+        'Matched_ID': pair.WA_ID,
+        'Matched_Birth_Date': pair.WA_Birth_Date,
+        'Name_Match_Score': pair.Name_Match_Score,
+        'Birth_Date_Match_Score': 100,
+        'Combined_Match_Score': 0.7 * 100 + 0.3 * pair.Name_Match_Score
+    }
+    for pair in birth_pairs.itertuples(index=False)
+}
 
 # --- Matching loop: Apply both approaches for each athlete ---
 print("Performing fuzzy matching with two approaches...")
 results = []
 
-for idx, athlete in tqdm(athletes_without_wa.iterrows(), total=len(athletes_without_wa)):
-    # --- Approach 1 (Name-first) using both name formats ---
-    match1a = find_best_match_name_first(athlete['Full_Name'], athlete['Birth_date_str'], wa_names_list, wa_athletes_dict)
-    match1b = find_best_match_name_first(athlete['Full_Name_Reversed'], athlete['Birth_date_str'], wa_names_list, wa_athletes_dict)
-    if match1a and match1b:
-        best_match1 = match1a if match1a['Combined_Match_Score'] >= match1b['Combined_Match_Score'] else match1b
-    else:
-        best_match1 = match1a or match1b
+# itertuples yields lightweight namedtuples instead of boxing every row into a Series
+for i, athlete in enumerate(tqdm(athletes_without_wa.itertuples(), total=n_athletes)):
+    # --- Approach 2 (Birth date-first) ---
+    best_match2 = birth_first_matches.get(i)
 
-    # --- Approach 2 (Birth date-first) using both name formats ---
-    match2a = find_best_match_birth_first(athlete['Birth_date_str'], athlete['Full_Name'], wa_athletes_dict)
-    match2b = find_best_match_birth_first(athlete['Birth_date_str'], athlete['Full_Name_Reversed'], wa_athletes_dict)
-    if match2a and match2b:
-        best_match2 = match2a if match2a['Combined_Match_Score'] >= match2b['Combined_Match_Score'] else match2b
+    # A birth date-first score of 97 or more means a name score of at least 90 among the WA athletes
+    # sharing the athlete's birth date. Approach 1 is deliberately skipped then, as a heuristic: it could
+    # still score higher on name alone against a WA athlete without a birth date, but such a match is
+    # taken to be less trustworthy than a near-perfect one on the same birth date
+    if athlete.Birth_date_str and best_match2 and best_match2['Combined_Match_Score'] >= 97:
+        best_match1 = None
     else:
-        best_match2 = match2a or match2b
+        # --- Approach 1 (Name-first) ---
+        best_match1 = name_first_matches.get(i)
 
     # --- Combine the results ---
     if best_match1 and best_match2:
@@ -142,9 +170,9 @@ for idx, athlete in tqdm(athletes_without_wa.iterrows(), total=len(athletes_with
 
     if final_match:
         results.append({
-            'Athlete_Index': idx,
-            'Athlete_Name': athlete['Full_Name'],
-            'Athlete_Birth_Date': athlete['Birth_date_str'],
+            'Athlete_Index': athlete.Index,
+            'Athlete_Name': athlete.Full_Name,
+            'Athlete_Birth_Date': athlete.Birth_date_str,
             # Results from Approach 1:
             'A1_Matched_Name': best_match1['Matched_Name'] if best_match1 else None,
             'A1_Matched_ID': best_match1['Matched_ID'] if best_match1 else None,
@@ -176,26 +204,22 @@ athlete_df['A2_Match_Score'] = None
 athlete_df['WA_Match_Confidence'] = None
 athlete_df['WA_Recommended'] = False
 
-for _, match in results_df.iterrows():
-    idx = match['Athlete_Index']
-    athlete_df.loc[idx, 'WA_Matched_Name'] = match['Final_Matched_Name']
-    athlete_df.loc[idx, 'WA_Matched_Birth_Date'] = match['Final_Matched_Birth_Date']
-    athlete_df.loc[idx, 'WA_Matched_ID'] = match['Final_Matched_ID']
-    athlete_df.loc[idx, 'WA_Match_Score'] = match['Overall_Match_Score']
-    athlete_df.loc[idx, 'A1_Match_Score'] = match['A1_Match_Score']
-    athlete_df.loc[idx, 'A2_Match_Score'] = match['A2_Match_Score']
-    
-    # Assign confidence based on overall match score
-    if match['Overall_Match_Score'] is not None:
-        if match['Overall_Match_Score'] >= 90:
-            athlete_df.loc[idx, 'WA_Match_Confidence'] = 'High'
-            athlete_df.loc[idx, 'WA_Recommended'] = True
-        elif match['Overall_Match_Score'] >= 70:
-            athlete_df.loc[idx, 'WA_Match_Confidence'] = 'Medium'
-            athlete_df.loc[idx, 'WA_Recommended'] = True
-        else:
-            athlete_df.loc[idx, 'WA_Match_Confidence'] = 'Low'
-            athlete_df.loc[idx, 'WA_Recommended'] = False
+# Bin the overall scores into confidence bands: Low (< 70), Medium (70-90), High (>= 90)
+# (skipped when nothing was matched: an empty results_df has no columns to index)
+if not results_df.empty:
+    results_df.set_index('Athlete_Index', inplace=True)
+    results_df['WA_Match_Confidence'] = pd.cut(results_df['Overall_Match_Score'], bins=[-np.inf, 70, 90, np.inf],
+                                               labels=['Low', 'Medium', 'High'], right=False).astype(object)
+    results_df['WA_Recommended'] = results_df['Overall_Match_Score'] >= 70
+
+    # Update the dataframe with the final match data in one bulk assignment
+    athlete_df.loc[results_df.index, [
+        'WA_Matched_Name', 'WA_Matched_Birth_Date', 'WA_Matched_ID', 'WA_Match_Score',
+        'A1_Match_Score', 'A2_Match_Score', 'WA_Match_Confidence', 'WA_Recommended'
+    ]] = results_df[[
+        'Final_Matched_Name', 'Final_Matched_Birth_Date', 'Final_Matched_ID', 'Overall_Match_Score',
+        'A1_Match_Score', 'A2_Match_Score', 'WA_Match_Confidence', 'WA_Recommended'
+    ]].values
 
 # For high confidence matches, also create a column with the recommended WA_no
 athlete_df['WA_Recommended_ID'] = None
@@ -204,7 +228,7 @@ athlete_df.loc[athlete_df['WA_Match_Score'] >= 90, 'WA_Recommended_ID'] = athlet
 # --- Save the updated dataframe to a new Excel file ---
 print("Saving updated athlete data...")
 output_file = "2025-Athletics-Competition-Database-Updated.xlsx"
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
     athlete_df.to_excel(writer, sheet_name='Athlete', index=False)
     wa_codes_df.to_excel(writer, sheet_name='WorldAthletics_codes', index=False)
     # Add a summary sheet
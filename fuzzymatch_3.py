@@ -1,7 +1,7 @@
+import importlib.util
 import pandas as pd
 import numpy as np
-from fuzzywuzzy import fuzz as fw_fuzz, process as fw_process
-from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+from rapidfuzz import fuzz, process, utils
 from tqdm import tqdm
 
 # --------------------------
@@ -9,8 +9,14 @@ from tqdm import tqdm
 # --------------------------
 print("Loading Excel file...")
 file_path = "2025-Athletics-Competition-Database.xlsx"
-athlete_df = pd.read_excel(file_path, sheet_name="Athlete")
-wa_codes_df = pd.read_excel(file_path, sheet_name="WorldAthletics_codes")
+# Open the workbook once and parse both sheets from it, using the much faster Rust-based calamine
+# reader when python-calamine is installed and pandas supports it (2.2+), openpyxl otherwise
+pandas_version = tuple(int(part) for part in pd.__version__.split(".")[:2])
+use_calamine = pandas_version >= (2, 2) and importlib.util.find_spec("python_calamine") is not None
+excel_engine = "calamine" if use_calamine else "openpyxl"
+with pd.ExcelFile(file_path, engine=excel_engine) as xls:
+    athlete_df = xls.parse("Athlete")
+    wa_codes_df = xls.parse("WorldAthletics_codes")
 
 # Make a copy to preserve original data
 original_athlete_df = athlete_df.copy()
@@ -19,206 +25,172 @@ original_athlete_df = athlete_df.copy()
 athletes_without_wa = athlete_df[athlete_df['WA_no'].isna()].copy()
 print(f"Number of athletes without WA_no: {len(athletes_without_wa)} out of {len(athlete_df)}")
 
-# Prepare athlete data: create full names (normal and reversed) and birth date string
+def format_birth_dates(dates):
+    # Format datetimes as YYYY-MM-DD in a single NumPy call instead of a per-element strftime (missing dates become NaN)
+    day_strs = np.datetime_as_string(dates.to_numpy(dtype='datetime64[D]'), unit='D')
+    return pd.Series(day_strs, index=dates.index, dtype=object).where(dates.notna())
+
+# Prepare athlete data: create full names and birth date string
 print("Preparing athlete data for matching...")
 athletes_without_wa['Full_Name'] = athletes_without_wa['First_name'].astype(str) + ' ' + athletes_without_wa['Last_name'].astype(str)
-athletes_without_wa['Full_Name_Reversed'] = athletes_without_wa['Last_name'].astype(str) + ' ' + athletes_without_wa['First_name'].astype(str)
-athletes_without_wa['Birth_date_str'] = pd.to_datetime(athletes_without_wa['Birth_date'], errors='coerce').dt.strftime('%Y-%m-%d')
+athletes_without_wa['Birth_date_str'] = format_birth_dates(pd.to_datetime(athletes_without_wa['Birth_date'], errors='coerce'))
 
 # Prepare World Athletics data
 print("Preparing World Athletics data...")
-wa_athletes_dict = {}
-wa_names_list = []
-for _, row in wa_codes_df.iterrows():
-    name = row['Name']
-    wa_id = row['ID']
-    birth_date = row['birthDate']
-    birth_date_str = pd.Timestamp(birth_date).strftime('%Y-%m-%d') if pd.notna(birth_date) else None
-    wa_athletes_dict[name] = {
-        'ID': wa_id,
-        'birthDate': birth_date_str,
-        'urlSlug': row['urlSlug'],
-        'disciplines': row['disciplines']
-    }
-    wa_names_list.append(name)
+# Format all birth dates in one vectorized pass (missing dates become None)
+wa_birth_dates = pd.to_datetime(wa_codes_df['birthDate'], errors='coerce')
+wa_birth_date_strs = format_birth_dates(wa_birth_dates).where(wa_birth_dates.notna(), None)
+
+# Keep the WA data as parallel columns, so a match's position indexes its name, ID and birth date directly
+wa_names_list = wa_codes_df['Name'].tolist()
+wa_ids = wa_codes_df['ID'].to_numpy()
+wa_birth_arr = wa_birth_date_strs.to_numpy()
 
 # --------------------------
 # Define Matching Functions
 # --------------------------
+# Two RapidFuzz scorers are run side by side and their scores averaged in the summary. Both ignore
+# token order, so one name per athlete covers the normal and reversed name orders. Scores stay
+# unrounded float64, like the RapidFuzz path this script always had (fuzzy_match.py and
+# fuzzy_match2.py round to integers because they replaced fuzzywuzzy, which did).
+n_athletes = len(athletes_without_wa)
+full_names = athletes_without_wa['Full_Name'].tolist()
+athlete_birth_dates = athletes_without_wa['Birth_date_str'].to_numpy(dtype=object, na_value=None)[:, None]
+top_n = min(5, len(wa_names_list))
+
+wa_candidates_df = pd.DataFrame({
+    'WA_Name': wa_names_list,
+    'WA_Birth_Date': wa_birth_arr,
+    'WA_ID': wa_ids
+})
+
+def token_sort(name):
+    return " ".join(sorted(name.split()))
 
 # Approach 1: Name-first matching
-def find_best_match_name_first_fw(athlete_name, athlete_birth_date, wa_names, wa_dict):
-    matches = fw_process.extract(athlete_name, wa_names, limit=5, scorer=fw_fuzz.token_sort_ratio)
-    best_match = None
-    best_combined_score = 0
-    for match_name, name_score in matches:
-        wa_data = wa_dict[match_name]
-        wa_birth_date = wa_data['birthDate']
-        # Assign 100 if birth dates match exactly; 0 otherwise.
-        birth_date_score = 100 if (athlete_birth_date and wa_birth_date and athlete_birth_date == wa_birth_date) else 0
-        combined_score = (0.7 * name_score + 0.3 * birth_date_score) if (athlete_birth_date and wa_birth_date) else name_score
-        if combined_score > best_combined_score:
-            best_combined_score = combined_score
-            best_match = {
-                'Matched_Name': match_name,
-                'Matched_ID': wa_data['ID'],
-                'Matched_Birth_Date': wa_data['birthDate'],
-                'Name_Match_Score': name_score,
-                'Birth_Date_Match_Score': birth_date_score,
-                'Combined_Match_Score': combined_score
-            }
-    return best_match
-
-def find_best_match_name_first_rf(athlete_name, athlete_birth_date, wa_names, wa_dict):
-    matches = rf_process.extract(athlete_name, wa_names, limit=5, scorer=rf_fuzz.token_sort_ratio)
-    best_match = None
-    best_combined_score = 0
-    for match in matches:
-        # RapidFuzz returns (match, score, index)
-        match_name, name_score, _ = match
-        wa_data = wa_dict[match_name]
-        wa_birth_date = wa_data['birthDate']
-        birth_date_score = 100 if (athlete_birth_date and wa_birth_date and athlete_birth_date == wa_birth_date) else 0
-        combined_score = (0.7 * name_score + 0.3 * birth_date_score) if (athlete_birth_date and wa_birth_date) else name_score
-        if combined_score > best_combined_score:
-            best_combined_score = combined_score
-            best_match = {
-                'Matched_Name': match_name,
-                'Matched_ID': wa_data['ID'],
-                'Matched_Birth_Date': wa_data['birthDate'],
-                'Name_Match_Score': name_score,
-                'Birth_Date_Match_Score': birth_date_score,
-                'Combined_Match_Score': combined_score
-            }
-    return best_match
+def find_best_matches_name_first(queries, choices, scorer, processor=None):
+    # Score every athlete name against every WA name in one multithreaded C++ call (identical names are
+    # only scored once and share their row of scores), then keep the 5 best WA candidates of every
+    # athlete, highest score first (ties keep list order, like process.extract)
+    unique_queries, query_rows = np.unique(np.array(queries, dtype=str), return_inverse=True)
+    name_scores = process.cdist(unique_queries.tolist(), choices, scorer=scorer, processor=processor,
+                                dtype=np.float64, workers=-1)[query_rows]
+    top_idxs = np.argsort(-name_scores, axis=1, kind='stable')[:, :top_n]
+    top_scores = np.take_along_axis(name_scores, top_idxs, axis=1)
+
+    # Compare birth dates for all candidates at once: 100 on an exact match, 0 otherwise, counted
+    # (70% name, 30% birth date) whenever the WA athlete has a birth date, even if the athlete has none
+    top_birth_dates = wa_birth_arr[top_idxs]
+    has_birth_dates = pd.notna(top_birth_dates)
+    birth_date_scores = np.where(has_birth_dates & (top_birth_dates == athlete_birth_dates), 100, 0)
+    combined_scores = np.where(has_birth_dates, 0.7 * top_scores + 0.3 * birth_date_scores, top_scores)
+
+    # Each athlete's best candidate is one row-wise argmax (the first one on ties)
+    best_cols = np.argmax(combined_scores, axis=1)[:, None]
+    best_wa_idxs = np.take_along_axis(top_idxs, best_cols, axis=1).ravel()
+    best_name_scores = np.take_along_axis(top_scores, best_cols, axis=1).ravel()
+    best_birth_date_scores = np.take_along_axis(birth_date_scores, best_cols, axis=1).ravel()
+    best_combined_scores = np.take_along_axis(combined_scores, best_cols, axis=1).ravel()
+    return {
+        i: {
+            'Matched_Name': wa_names_list[best_wa_idxs[i]],
+            'Matched_ID': wa_ids[best_wa_idxs[i]],
+            'Matched_Birth_Date': wa_birth_arr[best_wa_idxs[i]],
+            'Name_Match_Score': best_name_scores[i],
+            'Birth_Date_Match_Score': best_birth_date_scores[i],
+            'Combined_Match_Score': best_combined_scores[i]
+        }
+        for i in np.flatnonzero(best_combined_scores > 0).tolist()
+    }
 
 # Approach 2: Birth date-first matching
-def find_best_match_birth_first_fw(athlete_birth_date, athlete_name, wa_dict):
-    # Filter candidates by exact birth date
-    candidates = {name: data for name, data in wa_dict.items() if data['birthDate'] == athlete_birth_date} if athlete_birth_date else wa_dict
-    if not candidates:
-        return None
-    candidate_names = list(candidates.keys())
-    matches = fw_process.extract(athlete_name, candidate_names, limit=5, scorer=fw_fuzz.token_sort_ratio)
-    best_match = None
-    best_score = 0
-    for match_name, name_score in matches:
-        combined_score = 0.7 * 100 + 0.3 * name_score  # birth date score is fixed at 100
-        if combined_score > best_score:
-            best_score = combined_score
-            best_match = {
-                'Matched_Name': match_name,
-                'Matched_ID': candidates[match_name]['ID'],
-                'Matched_Birth_Date': candidates[match_name]['birthDate'],
-                'Name_Match_Score': name_score,
-                'Birth_Date_Match_Score': 100,
-                'Combined_Match_Score': combined_score
-            }
-    return best_match
+def find_best_matches_birth_first(queries, wa_choices, scorer, processor=None):
+    # Join every athlete to the WA athletes sharing their exact birth date in a single merge and score each
+    # pair once. Only the best candidate per athlete is used, so take it directly like process.extractOne
+    # (the merge keeps each athlete's candidates in WA order, so ties go to the first one).
+    birth_pairs = pd.DataFrame({
+        'Athlete_Pos': np.arange(n_athletes),
+        'Birth_date_str': athletes_without_wa['Birth_date_str'].to_numpy(),
+        'Query': queries
+    }).dropna(subset=['Birth_date_str']).merge(
+        wa_candidates_df.assign(WA_Choice=wa_choices).dropna(subset=['WA_Birth_Date']),
+        left_on='Birth_date_str', right_on='WA_Birth_Date'
+    )
+    birth_pairs['Name_Match_Score'] = process.cpdist(birth_pairs['Query'].tolist(), birth_pairs['WA_Choice'].tolist(),
+                                                     scorer=scorer, processor=processor, dtype=np.float64, workers=-1)
+    birth_pairs = birth_pairs.loc[birth_pairs.groupby('Athlete_Pos')['Name_Match_Score'].idxmax()]
+    return {
+        pair.Athlete_Pos: {
+            'Matched_Name': pair.WA_Name,
+            'Matched_ID': pair.WA_ID,
+            'Matched_Birth_Date': pair.WA_Birth_Date,
+            'Name_Match_Score': pair.Name_Match_Score,
+            'Birth_Date_Match_Score': 100,
+            'Combined_Match_Score': 0.7 * 100 + 0.3 * pair.Name_Match_Score  # birth date score is fixed at 100
+        }
+        for pair in birth_pairs.itertuples(index=False)
+    }
 
-def find_best_match_birth_first_rf(athlete_birth_date, athlete_name, wa_dict):
-    candidates = {name: data for name, data in wa_dict.items() if data['birthDate'] == athlete_birth_date} if athlete_birth_date else wa_dict
-    if not candidates:
-        return None
-    candidate_names = list(candidates.keys())
-    matches = rf_process.extract(athlete_name, candidate_names, limit=5, scorer=rf_fuzz.token_sort_ratio)
-    best_match = None
-    best_score = 0
-    for match in matches:
-        match_name, name_score, _ = match
-        combined_score = 0.7 * 100 + 0.3 * name_score
-        if combined_score > best_score:
-            best_score = combined_score
-            best_match = {
-                'Matched_Name': match_name,
-                'Matched_ID': candidates[match_name]['ID'],
-                'Matched_Birth_Date': candidates[match_name]['birthDate'],
-                'Name_Match_Score': name_score,
-                'Birth_Date_Match_Score': 100,
-                'Combined_Match_Score': combined_score
-            }
-    return best_match
+def run_scorer(prepare, scorer, processor=None):
+    # Run both approaches for one scorer, on names mapped through prepare once up front
+    athlete_queries = [prepare(name) for name in full_names]
+    wa_choices = [prepare(name) for name in wa_names_list]
+    name_first_matches = find_best_matches_name_first(athlete_queries, wa_choices, scorer, processor)
+    birth_first_matches = find_best_matches_birth_first(athlete_queries, wa_choices, scorer, processor)
+    return name_first_matches, birth_first_matches
+
+def combine_approaches(best_match1, best_match2):
+    if best_match1 and best_match2:
+        # If both approaches point to the same WA ID, take the average score
+        if best_match1['Matched_ID'] == best_match2['Matched_ID']:
+            return best_match1, (best_match1['Combined_Match_Score'] + best_match2['Combined_Match_Score']) / 2
+        # Otherwise choose the one with the higher score and penalize slightly
+        if best_match1['Combined_Match_Score'] >= best_match2['Combined_Match_Score']:
+            return best_match1, best_match1['Combined_Match_Score'] * 0.9
+        return best_match2, best_match2['Combined_Match_Score'] * 0.9
+    final_match = best_match1 or best_match2
+    return final_match, final_match['Combined_Match_Score'] if final_match else None
 
 # --------------------------
 # Matching Loop
 # --------------------------
-print("Performing fuzzy matching with fuzzywuzzy and RapidFuzz...")
+print("Scoring athlete names with token_sort_ratio and token_set_ratio...")
+scorer_runs = {
+    # token_sort_ratio on the raw names, as a plain ratio on names token-sorted once up front
+    'SORT': run_scorer(token_sort, fuzz.ratio),
+    # token_set_ratio on processed names: case-insensitive and tolerant of extra name parts
+    'SET': run_scorer(str, fuzz.token_set_ratio, processor=utils.default_process)
+}
+
+print("Combining the matching approaches for each scorer...")
 results = []
 
-for idx, athlete in tqdm(athletes_without_wa.iterrows(), total=len(athletes_without_wa)):
-    # Extract athlete details
-    name_normal = athlete['Full_Name']
-    name_reversed = athlete['Full_Name_Reversed']
-    birth_date_str = athlete['Birth_date_str']
-    
-    # --- Using fuzzywuzzy ---
-    # Approach 1: Name-first
-    fw_match1a = find_best_match_name_first_fw(name_normal, birth_date_str, wa_names_list, wa_athletes_dict)
-    fw_match1b = find_best_match_name_first_fw(name_reversed, birth_date_str, wa_names_list, wa_athletes_dict)
-    fw_best_match1 = fw_match1a if (fw_match1a and (not fw_match1b or fw_match1a['Combined_Match_Score'] >= fw_match1b['Combined_Match_Score'])) else fw_match1b
-
-    # Approach 2: Birth date-first
-    fw_match2a = find_best_match_birth_first_fw(birth_date_str, name_normal, wa_athletes_dict)
-    fw_match2b = find_best_match_birth_first_fw(birth_date_str, name_reversed, wa_athletes_dict)
-    fw_best_match2 = fw_match2a if (fw_match2a and (not fw_match2b or fw_match2a['Combined_Match_Score'] >= fw_match2b['Combined_Match_Score'])) else fw_match2b
+# itertuples yields lightweight namedtuples instead of boxing every row into a Series
+for i, athlete in enumerate(tqdm(athletes_without_wa.itertuples(), total=n_athletes)):
+    birth_date_str = athlete.Birth_date_str
+    result = {
+        'Athlete_Index': athlete.Index,
+        'Athlete_Name': athlete.Full_Name,
+        'Athlete_Birth_Date': birth_date_str
+    }
+    for prefix, (name_first_matches, birth_first_matches) in scorer_runs.items():
+        # Approach 2: Birth date-first
+        best_match2 = birth_first_matches.get(i)
 
-    # Combine fuzzywuzzy approaches
-    if fw_best_match1 and fw_best_match2:
-        if fw_best_match1['Matched_ID'] == fw_best_match2['Matched_ID']:
-            fw_overall_score = (fw_best_match1['Combined_Match_Score'] + fw_best_match2['Combined_Match_Score']) / 2
-            fw_final_match = fw_best_match1
+        # Skip Approach 1 when Approach 2 already found a near-perfect match (name score >= 90 on the birth date)
+        if birth_date_str and best_match2 and best_match2['Combined_Match_Score'] >= 97:
+            best_match1 = None
         else:
-            if fw_best_match1['Combined_Match_Score'] >= fw_best_match2['Combined_Match_Score']:
-                fw_overall_score = fw_best_match1['Combined_Match_Score'] * 0.9
-                fw_final_match = fw_best_match1
-            else:
-                fw_overall_score = fw_best_match2['Combined_Match_Score'] * 0.9
-                fw_final_match = fw_best_match2
-    else:
-        fw_final_match = fw_best_match1 or fw_best_match2
-        fw_overall_score = fw_final_match['Combined_Match_Score'] if fw_final_match else None
-
-    # --- Using RapidFuzz ---
-    # Approach 1: Name-first
-    rf_match1a = find_best_match_name_first_rf(name_normal, birth_date_str, wa_names_list, wa_athletes_dict)
-    rf_match1b = find_best_match_name_first_rf(name_reversed, birth_date_str, wa_names_list, wa_athletes_dict)
-    rf_best_match1 = rf_match1a if (rf_match1a and (not rf_match1b or rf_match1a['Combined_Match_Score'] >= rf_match1b['Combined_Match_Score'])) else rf_match1b
-
-    # Approach 2: Birth date-first
-    rf_match2a = find_best_match_birth_first_rf(birth_date_str, name_normal, wa_athletes_dict)
-    rf_match2b = find_best_match_birth_first_rf(birth_date_str, name_reversed, wa_athletes_dict)
-    rf_best_match2 = rf_match2a if (rf_match2a and (not rf_match2b or rf_match2a['Combined_Match_Score'] >= rf_match2b['Combined_Match_Score'])) else rf_match2b
+            # Approach 1: Name-first
+            best_match1 = name_first_matches.get(i)
 
-    # Combine RapidFuzz approaches
-    if rf_best_match1 and rf_best_match2:
-        if rf_best_match1['Matched_ID'] == rf_best_match2['Matched_ID']:
-            rf_overall_score = (rf_best_match1['Combined_Match_Score'] + rf_best_match2['Combined_Match_Score']) / 2
-            rf_final_match = rf_best_match1
-        else:
-            if rf_best_match1['Combined_Match_Score'] >= rf_best_match2['Combined_Match_Score']:
-                rf_overall_score = rf_best_match1['Combined_Match_Score'] * 0.9
-                rf_final_match = rf_best_match1
-            else:
-                rf_overall_score = rf_best_match2['Combined_Match_Score'] * 0.9
-                rf_final_match = rf_best_match2
-    else:
-        rf_final_match = rf_best_match1 or rf_best_match2
-        rf_overall_score = rf_final_match['Combined_Match_Score'] if rf_final_match else None
+        final_match, overall_score = combine_approaches(best_match1, best_match2)
+        result[f'{prefix}_Matched_Name'] = final_match['Matched_Name'] if final_match else None
+        result[f'{prefix}_Matched_ID'] = final_match['Matched_ID'] if final_match else None
+        result[f'{prefix}_Overall_Score'] = overall_score
 
     # Save results for the current athlete
-    results.append({
-        'Athlete_Index': idx,
-        'Athlete_Name': name_normal,
-        'Athlete_Birth_Date': birth_date_str,
-        # FuzzyWuzzy results
-        'FW_Matched_Name': fw_final_match['Matched_Name'] if fw_final_match else None,
-        'FW_Matched_ID': fw_final_match['Matched_ID'] if fw_final_match else None,
-        'FW_Overall_Score': fw_overall_score,
-        # RapidFuzz results
-        'RF_Matched_Name': rf_final_match['Matched_Name'] if rf_final_match else None,
-        'RF_Matched_ID': rf_final_match['Matched_ID'] if rf_final_match else None,
-        'RF_Overall_Score': rf_overall_score
-    })
+    results.append(result)
 
 # Create a DataFrame of matching results and display
 results_df = pd.DataFrame(results)
@@ -228,30 +200,13 @@ print(results_df)
 # --------------------------
 # Create Summary Report
 # --------------------------
-# Create an Overall_Score column by averaging FW and RF scores when both are available,
-# otherwise using whichever score is available.
-def avg_score(row):
-    scores = []
-    if pd.notnull(row['FW_Overall_Score']):
-        scores.append(row['FW_Overall_Score'])
-    if pd.notnull(row['RF_Overall_Score']):
-        scores.append(row['RF_Overall_Score'])
-    return np.mean(scores) if scores else np.nan
-
-results_df['Overall_Score'] = results_df.apply(avg_score, axis=1)
+# Create an Overall_Score column by averaging the two scorers' scores when both are available,
+# otherwise using whichever score is available (a row-wise mean that skips missing scores).
+results_df['Overall_Score'] = results_df[['SORT_Overall_Score', 'SET_Overall_Score']].astype(float).mean(axis=1)
 
 # Define confidence bands: High (>=90), Medium (70-90), Low (<70)
-def get_confidence(score):
-    if pd.isna(score):
-        return None
-    if score >= 90:
-        return 'High'
-    elif score >= 70:
-        return 'Medium'
-    else:
-        return 'Low'
-
-results_df['Confidence'] = results_df['Overall_Score'].apply(get_confidence)
+results_df['Confidence'] = pd.cut(results_df['Overall_Score'], bins=[-np.inf, 70, 90, np.inf],
+                                  labels=['Low', 'Medium', 'High'], right=False).astype(object)
 
 # Calculate summary counts
 total_athletes = len(results_df)